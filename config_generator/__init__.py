@@ -1,20 +1,54 @@
-from config_generator.feature_extractor import (
-    LLMFeatureExtractor,
-    extract_pagination_html,
-)
-from config_generator.generator import ConfigGenerator
-from config_generator.llm_client import LLMClient
-from config_generator.pagination_examples import (
-    PAGINATION_EXAMPLES,
-    format_dynamic_pagination_examples,
-    format_static_pagination_examples,
-)
+import importlib
+from typing import TYPE_CHECKING
+
 from config_generator.schemas import (
     GeneratedConfig,
     LLMFeatures,
     SimilarConfig,
 )
-from config_generator.vector_store import ConfigVectorStore
+
+if TYPE_CHECKING:
+    from config_generator.feature_extractor import (
+        LLMFeatureExtractor,
+        extract_pagination_html,
+    )
+    from config_generator.generator import ConfigGenerator
+    from config_generator.llm_client import LLMClient
+    from config_generator.pagination_examples import (
+        PAGINATION_EXAMPLES,
+        build_pagination_prompt,
+        format_dynamic_pagination_examples,
+        format_static_pagination_examples,
+    )
+    from config_generator.vector_store import ConfigVectorStore
+
+# Symbols whose modules pull in heavy dependencies (openai, crawl4ai, chromadb,
+# sentence-transformers) are imported on first attribute access (PEP 562).
+_LAZY_IMPORTS = {
+    "ConfigGenerator": "config_generator.generator",
+    "ConfigVectorStore": "config_generator.vector_store",
+    "LLMClient": "config_generator.llm_client",
+    "LLMFeatureExtractor": "config_generator.feature_extractor",
+    "PAGINATION_EXAMPLES": "config_generator.pagination_examples",
+    "build_pagination_prompt": "config_generator.pagination_examples",
+    "extract_pagination_html": "config_generator.feature_extractor",
+    "format_dynamic_pagination_examples": "config_generator.pagination_examples",
+    "format_static_pagination_examples": "config_generator.pagination_examples",
+}
+
+
+def __getattr__(name: str):
+    module_path = _LAZY_IMPORTS.get(name)
+    if module_path is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_path), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
+
 
 __all__ = [
     "ConfigGenerator",
@@ -25,6 +59,7 @@ __all__ = [
     "LLMFeatures",
     "PAGINATION_EXAMPLES",
     "SimilarConfig",
+    "build_pagination_prompt",
     "extract_pagination_html",
     "format_dynamic_pagination_examples",
     "format_static_pagination_examples",
@@ -1,16 +1,31 @@
-import json
+import functools
+import hashlib
 import logging
 import re
+import sqlite3
+import time
 
-from bs4 import BeautifulSoup
+import tiktoken
+from pydantic import ValidationError
+from selectolax.lexbor import LexborHTMLParser
 
 from config_generator.llm_client import LLMClient
 from config_generator.prompts import (
     INFERENCE_FEATURE_PROMPT,
+    INFERENCE_FEATURE_SYSTEM_PROMPT,
     TRAINING_FEATURE_PROMPT,
+    TRAINING_FEATURE_SYSTEM_PROMPT,
 )
 from config_generator.schemas import LLMFeatures
-from config_generator.utils import clean_html, ensure_dict, parse_json_response
+from config_generator.utils import (
+    clean_html,
+    dumps_json,
+    ensure_dict_cached,
+    extract_json_text,
+    is_invalid_json_error,
+    is_valid_model_response,
+    truncate_html,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -37,107 +52,247 @@ PAGINATION_SELECTORS = [
     "div[class*='pagination']",
 ]
 
+# One combined query answers "is there any pagination at all?" in a single tree walk;
+# the per-selector loop then only runs on pages that actually have a match.
+COMBINED_PAGINATION_SELECTOR = ", ".join(PAGINATION_SELECTORS)
+# Closing document wrapper left at the end of a cleaned full page
+DOCUMENT_END_RE = re.compile(r"\s*</body>\s*</html>\s*$", re.IGNORECASE)
+
 
 def extract_pagination_html(html: str, max_length: int = 2000) -> str:
     """Extract the pagination HTML snippet from a full page.
 
-    Searches for common pagination selectors using BeautifulSoup.
-    Falls back to the last ``max_length`` characters of cleaned HTML
-    if no pagination element is found.
+    Searches for common pagination selectors using the lexbor HTML parser.
+    A matched element is cut to ``max_length`` UTF-8 bytes on a tag boundary
+    (see :func:`truncate_html`). Falls back to the last ``max_length``
+    characters of cleaned HTML if no pagination element is found.
 
     Args:
         html: Full page HTML string.
-        max_length: Max length of fallback snippet.
+        max_length: Byte budget for a matched element; character length of
+            the fallback snippet.
 
     Returns:
         Outer HTML of the pagination element, or a fallback tail.
     """
-    soup = BeautifulSoup(html, "html.parser")
-    for selector in PAGINATION_SELECTORS:
-        el = soup.select_one(selector)
-        if el:
-            snippet = str(el)
-            if len(snippet) > max_length:
-                snippet = snippet[:max_length]
-            return snippet
+    tree = LexborHTMLParser(html)
+    if tree.css_first(COMBINED_PAGINATION_SELECTOR):
+        for selector in PAGINATION_SELECTORS:
+            node = tree.css_first(selector)
+            if node:
+                return truncate_html(node.html or "", max_length)
 
     # Fallback: return the tail of the HTML (pagination is usually at the bottom)
-    cleaned = clean_html(html)
+    cleaned = DOCUMENT_END_RE.sub("", clean_html(html))
     return cleaned[-max_length:] if len(cleaned) > max_length else cleaned
 
 
 class LLMFeatureExtractor:
     """Extracts structured features from HTML pages using OpenAI."""
 
+    MAX_HTML_TOKENS = 12_000
+    # Hard cap for "full" HTML so config generation never overflows the context window
+    MAX_FULL_HTML_TOKENS = 100_000
+    FALLBACK_ENCODING = "o200k_base"
+    # Character limits used when no tokenizer can be loaded (e.g. offline, BPE not cached)
     MAX_HTML_LENGTH = 40_000
+    MAX_FULL_HTML_LENGTH = MAX_FULL_HTML_TOKENS * 4
+    FEATURE_CACHE_TTL = 7 * 24 * 3600
 
-    def __init__(self, llm_client: LLMClient):
+    def __init__(self, llm_client: LLMClient, cache_path: str | None = None):
+        """
+        Args:
+            llm_client: Client used for feature-extraction calls.
+            cache_path: SQLite file for extracted features keyed by content hash.
+                In-memory when omitted.
+        """
         self.llm_client = llm_client
+        self._encoding: tiktoken.Encoding | None = None
+        self._encoding_unavailable = False
+        self._cache = sqlite3.connect(cache_path or ":memory:")
+        self._cache.execute(
+            "CREATE TABLE IF NOT EXISTS feature_cache ("
+            "key TEXT PRIMARY KEY, features TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._cache.commit()
 
-    def extract_training_features(self, html: str, config: dict) -> LLMFeatures:
+    @property
+    def encoding(self) -> tiktoken.Encoding | None:
+        """Tokenizer matching the client's model, or None if it cannot be loaded.
+
+        tiktoken downloads its BPE file on first use; a failure is logged once
+        and not retried, and HTML is then truncated by characters.
+        """
+        if self._encoding is None and not self._encoding_unavailable:
+            try:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.llm_client.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding(self.FALLBACK_ENCODING)
+            except Exception as e:
+                logger.warning("tiktoken encoding unavailable, truncating HTML by characters: %s", e)
+                self._encoding_unavailable = True
+        return self._encoding
+
+    def close(self):
+        """Close the feature cache."""
+        self._cache.close()
+
+    async def extract_training_features(self, html: str, config: dict) -> LLMFeatures:
         """Extract features from a known HTML + config pair (for indexing)."""
         cleaned_html = self._prepare_html(html)
+        config_json = dumps_json(config)
+        cache_key = self._cache_key("training", cleaned_html, config_json)
+        cached = self._get_cached_features(cache_key)
+        if cached is not None:
+            return cached
+
         base_selector = self._extract_base_selector(config.get("json_css_schema", {}))
         pagination_type = self._get_pagination_type(config.get("pagination_config", {}))
         data_render_type = config.get("data_render_type", "SSR")
 
-        prompt = TRAINING_FEATURE_PROMPT.format(
+        prompt = TRAINING_FEATURE_PROMPT.substitute(
             html=cleaned_html,
             base_selector=base_selector,
             pagination_type=pagination_type,
             data_render_type=data_render_type,
-            config_json=json.dumps(config, indent=2, ensure_ascii=False)[:5000],
+            config_json=config_json[:5000],
         )
 
-        response_text = self.llm_client.call(prompt, step_label="training_feature_extraction")
-        features = self._parse_features(response_text)
-        return features
+        response_text = await self.llm_client.call(
+            prompt,
+            step_label="training_feature_extraction",
+            system_prompt=TRAINING_FEATURE_SYSTEM_PROMPT,
+            validate=functools.partial(is_valid_model_response, LLMFeatures),
+        )
+        return self._parse_features(response_text, cache_key=cache_key)
+
+    async def extract_inference_features(
+        self,
+        html: str,
+        url: str,
+        cleaned_html: str | None = None,
+        pagination_html: str | None = None,
+    ) -> LLMFeatures:
+        """Extract features from HTML of a new (unknown) page.
+
+        Args:
+            html: Raw page HTML.
+            url: Page URL.
+            cleaned_html: Result of ``_prepare_html(html, truncate=False)``, if
+                the caller already has it.
+            pagination_html: Result of ``extract_pagination_html(html)``, if
+                the caller already has it.
+        """
+        if cleaned_html is None:
+            cleaned_html = self._prepare_html(html, truncate=False)
+        cache_key = self._cache_key("inference", url, cleaned_html)
+        cached = self._get_cached_features(cache_key)
+        if cached is not None:
+            return cached
 
-    def extract_inference_features(self, html: str, url: str) -> LLMFeatures:
-        """Extract features from HTML of a new (unknown) page."""
-        cleaned_html = self._prepare_html(html, truncate=False)
-        pagination_html = extract_pagination_html(html)
+        if pagination_html is None:
+            pagination_html = extract_pagination_html(html)
 
-        prompt = INFERENCE_FEATURE_PROMPT.format(
+        prompt = INFERENCE_FEATURE_PROMPT.substitute(
             html=cleaned_html,
             url=url,
             pagination_html=pagination_html,
         )
 
-        response_text = self.llm_client.call(prompt, step_label="inference_feature_extraction")
-        return self._parse_features(response_text)
+        response_text = await self.llm_client.call(
+            prompt,
+            step_label="inference_feature_extraction",
+            system_prompt=INFERENCE_FEATURE_SYSTEM_PROMPT,
+            validate=functools.partial(is_valid_model_response, LLMFeatures),
+        )
+        return self._parse_features(response_text, cache_key=cache_key)
 
     def _prepare_html(self, html: str, truncate: bool = True) -> str:
         """Clean HTML by removing script/style/noscript tags and comments.
 
         Args:
             html: Raw HTML string.
-            truncate: If True, truncate to MAX_HTML_LENGTH keeping head + tail.
-                      If False, return full cleaned HTML (for config generation).
+            truncate: If True, truncate to MAX_HTML_TOKENS keeping head + tail.
+                      If False, return full cleaned HTML (for config generation),
+                      capped at MAX_FULL_HTML_TOKENS.
         """
         html = clean_html(html, remove_noscript=True)
+        encoding = self.encoding
+        if encoding is None:
+            return self._truncate_chars(html, self.MAX_HTML_LENGTH if truncate else self.MAX_FULL_HTML_LENGTH)
+        tokens = encoding.encode(html, disallowed_special=())
+        max_tokens = self.MAX_HTML_TOKENS if truncate else self.MAX_FULL_HTML_TOKENS
+        if not truncate:
+            logger.info("Cleaned HTML is %d tokens", len(tokens))
+            if len(tokens) > max_tokens:
+                logger.warning(
+                    "Cleaned HTML exceeds %d tokens (%d), truncating", max_tokens, len(tokens)
+                )
         # Truncate: keep beginning + end to preserve pagination at bottom
-        if truncate and len(html) > self.MAX_HTML_LENGTH:
-            head_size = self.MAX_HTML_LENGTH * 3 // 4
-            tail_size = self.MAX_HTML_LENGTH - head_size
-            html = html[:head_size] + "\n... [TRUNCATED MIDDLE] ...\n" + html[-tail_size:]
+        if len(tokens) > max_tokens:
+            head_size = max_tokens * 3 // 4
+            tail_size = max_tokens - head_size
+            html = (
+                encoding.decode(tokens[:head_size])
+                + "\n... [TRUNCATED MIDDLE] ...\n"
+                + encoding.decode(tokens[-tail_size:])
+            )
         return html
 
-    def _parse_features(self, text: str) -> LLMFeatures:
-        """Parse LLM response text into LLMFeatures."""
-        data = parse_json_response(text)
-        return LLMFeatures(**data)
+    @staticmethod
+    def _truncate_chars(html: str, max_length: int) -> str:
+        """Keep the first 3/4 and last 1/4 of *max_length* characters of *html*."""
+        if len(html) <= max_length:
+            return html
+        head_size = max_length * 3 // 4
+        tail_size = max_length - head_size
+        return html[:head_size] + "\n... [TRUNCATED MIDDLE] ...\n" + html[-tail_size:]
+
+    def _parse_features(self, text: str, cache_key: str | None = None) -> LLMFeatures:
+        """Parse LLM response text into LLMFeatures, caching successful parses under *cache_key*."""
+        json_text = extract_json_text(text)
+        try:
+            features = LLMFeatures.model_validate_json(json_text)
+        except ValidationError as e:
+            if not is_invalid_json_error(e):
+                raise
+            logger.error("Failed to parse JSON from LLM response: %s", e)
+            logger.debug("Raw response: %s", json_text[:500])
+            return LLMFeatures()
+        if features.model_fields_set and cache_key:
+            self._cache.execute(
+                "INSERT OR REPLACE INTO feature_cache VALUES (?, ?, ?)",
+                (cache_key, features.model_dump_json(), time.time()),
+            )
+            self._cache.commit()
+        return features
+
+    def _cache_key(self, *parts: str) -> str:
+        """Content hash of the inputs that determine extracted features."""
+        return hashlib.sha256("\0".join((self.llm_client.model, *parts)).encode()).hexdigest()
+
+    def _get_cached_features(self, cache_key: str) -> LLMFeatures | None:
+        """Return unexpired cached features for *cache_key*, if any."""
+        row = self._cache.execute(
+            "SELECT features FROM feature_cache WHERE key = ? AND created_at > ?",
+            (cache_key, time.time() - self.FEATURE_CACHE_TTL),
+        ).fetchone()
+        if row is None:
+            return None
+        logger.info("Feature cache hit")
+        return LLMFeatures.model_validate_json(row[0])
 
     def _extract_base_selector(self, json_css_schema) -> str:
         """Extract baseSelector from json_css_schema config."""
-        json_css_schema = ensure_dict(json_css_schema, default={})
+        json_css_schema = ensure_dict_cached(json_css_schema, default={})
         if not isinstance(json_css_schema, dict):
             return "unknown"
         return json_css_schema.get("baseSelector", "unknown")
 
     def _get_pagination_type(self, pagination_config) -> str:
         """Determine pagination type from config."""
-        parsed = ensure_dict(pagination_config, default={})
+        parsed = ensure_dict_cached(pagination_config, default={})
         if not isinstance(parsed, dict):
             return "none"
         pagination_config = parsed
@@ -1,7 +1,10 @@
-import json
+import asyncio
+import functools
 import logging
+from pathlib import Path
 
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CacheMode, CrawlerRunConfig
+from pydantic import ValidationError
 
 from config_generator.feature_extractor import (
     LLMFeatureExtractor,
@@ -9,35 +12,120 @@ from config_generator.feature_extractor import (
 )
 from config_generator.llm_client import LLMClient
 from config_generator.pagination_examples import (
-    format_dynamic_pagination_examples,
+    build_pagination_prompt,
     format_static_pagination_examples,
 )
-from config_generator.prompts import CONFIG_GENERATION_PROMPT
+from config_generator.prompts import (
+    CONFIG_GENERATION_PROMPT,
+    CONFIG_GENERATION_SYSTEM_PROMPT,
+)
 from config_generator.schemas import GeneratedConfig
-from config_generator.utils import parse_json_response
+from config_generator.utils import (
+    extract_json_text,
+    format_config_fields,
+    is_invalid_json_error,
+    is_valid_model_response,
+)
 from config_generator.vector_store import ConfigVectorStore
 
 logger = logging.getLogger(__name__)
 
+FEATURE_CACHE_FILENAME = "feature_cache.sqlite3"
+# Settle delay once a caller-supplied ``wait_for`` selector has already matched
+WAIT_FOR_SETTLE_DELAY = 0.5
+# How long to wait for a ``wait_for`` selector (ms), independent of page_timeout
+WAIT_FOR_TIMEOUT = 15_000
+
+# Static system prompt (instructions + static pagination examples), rendered once
+CONFIG_GENERATION_SYSTEM_TEXT = CONFIG_GENERATION_SYSTEM_PROMPT.substitute(
+    static_pagination_examples=format_static_pagination_examples(),
+)
+
 
 class ConfigGenerator:
-    """Main pipeline: URL → GeneratedConfig."""
+    """Main pipeline: URL → GeneratedConfig.
+
+    The headless browser is started on first fetch and reused for later URLs.
+    Use ``async with ConfigGenerator(...) as gen:`` or call :meth:`aclose` to
+    shut it down.
+    """
 
     def __init__(
         self,
         api_key: str,
         model: str,
         chroma_dir: str,
+        llm_cache_path: str | None = None,
+        cache_mode: CacheMode = CacheMode.BYPASS,
+        compact_json: bool = True,
+        page_timeout: int = 100_000,
+        delay_before_return_html: float = 5.0,
+        wait_until: str = "domcontentloaded",
     ):
-        self.llm_client = LLMClient(api_key=api_key, model=model)
-        self.feature_extractor = LLMFeatureExtractor(llm_client=self.llm_client)
+        self.llm_client = LLMClient(api_key=api_key, model=model, cache_path=llm_cache_path)
         self.vector_store = ConfigVectorStore(persist_dir=chroma_dir)
+        # The vector store opens Chroma lazily, so create the directory for the feature cache here
+        Path(chroma_dir).mkdir(parents=True, exist_ok=True)
+        self.feature_extractor = LLMFeatureExtractor(
+            llm_client=self.llm_client,
+            cache_path=str(Path(chroma_dir) / FEATURE_CACHE_FILENAME),
+        )
+        self.cache_mode = cache_mode
+        self.page_timeout = page_timeout
+        self.delay_before_return_html = delay_before_return_html
+        self.wait_until = wait_until
+        self.compact_json = compact_json
+        self._crawler: AsyncWebCrawler | None = None
+        self._crawler_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "ConfigGenerator":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the shared crawler (if started), the OpenAI client and the SQLite caches."""
+        async with self._crawler_lock:
+            if self._crawler is not None:
+                await self._crawler.close()
+                self._crawler = None
+        self.feature_extractor.close()
+        await self.llm_client.aclose()
+
+    async def generate_many(
+        self,
+        items: list[tuple[str, str]],
+        num_similar: int = 3,
+        concurrency: int = 8,
+    ) -> list[GeneratedConfig | BaseException]:
+        """Generate configs for several URLs concurrently.
+
+        Args:
+            items: ``(url, source_name)`` pairs.
+            num_similar: Number of similar configs to use as few-shot examples.
+            concurrency: Max number of pipelines running at once.
+
+        Returns:
+            Results in the order of *items*; a failed pipeline yields its exception.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def generate_one(url: str, source_name: str) -> GeneratedConfig:
+            async with semaphore:
+                return await self.generate(url, source_name, num_similar=num_similar)
+
+        return await asyncio.gather(
+            *(generate_one(url, source_name) for url, source_name in items),
+            return_exceptions=True,
+        )
 
     async def generate(
         self,
         url: str,
         source_name: str,
         num_similar: int = 3,
+        wait_for: str | None = None,
     ) -> GeneratedConfig:
         """Generate a scraping config for a new URL.
 
@@ -45,6 +133,11 @@ class ConfigGenerator:
             url: The target URL to generate config for.
             source_name: Human-readable name for the source.
             num_similar: Number of similar configs to use as few-shot examples.
+            wait_for: Optional CSS selector of listing/pagination elements. When
+                given, the fetch returns shortly after it matches instead of
+                waiting the full ``delay_before_return_html``. If it does not
+                match within ``WAIT_FOR_TIMEOUT`` ms, the page is fetched again
+                without it.
 
         Returns:
             Validated GeneratedConfig instance.
@@ -53,19 +146,36 @@ class ConfigGenerator:
 
         # Step 1: Fetch HTML
         logger.info("Step 1: Fetching HTML from %s", url)
-        html = await self._fetch_html(url)
+        html = await self._fetch_html(url, wait_for=wait_for)
         if not html:
             raise RuntimeError(f"Failed to fetch HTML from {url}")
         logger.info("Fetched %d characters of HTML", len(html))
 
+        # Cleaned HTML and the pagination snippet are used by several steps; compute once
+        cleaned_html = self.feature_extractor._prepare_html(html, truncate=False)
+        pagination_html = extract_pagination_html(html)
+
         # Step 2: Extract features (inference mode)
         logger.info("Step 2: Extracting features from HTML")
-        features = self.feature_extractor.extract_inference_features(html=html, url=url)
-        logger.info("Extracted features: %s", features.to_text())
+        features = await self.feature_extractor.extract_inference_features(
+            html=html,
+            url=url,
+            cleaned_html=cleaned_html,
+            pagination_html=pagination_html,
+        )
+        features_text = features.to_text()
+        logger.info("Extracted features: %s", features_text)
 
-        # Step 3: Find similar configs
+        # Step 3: Find similar configs (one embedder pass for features + pagination)
         logger.info("Step 3: Finding %d similar configs", num_similar)
-        similar_configs = self.vector_store.find_similar(features, k=num_similar)
+        if pagination_html:
+            features_embedding, pagination_embedding = self.vector_store.embed_batch(
+                [features_text, pagination_html]
+            )
+        else:
+            (features_embedding,) = self.vector_store.embed_batch([features_text])
+            pagination_embedding = None
+        similar_configs = self.vector_store.find_similar_by_embedding(features_embedding, k=num_similar)
         logger.info(
             "Found %d similar configs: %s",
             len(similar_configs),
@@ -74,79 +184,110 @@ class ConfigGenerator:
 
         # Step 3.5: Assemble pagination examples
         logger.info("Step 3.5: Assembling pagination examples")
-        pagination_html = extract_pagination_html(html)
-        logger.info("Extracted pagination HTML (%d chars):\n%s", len(pagination_html), pagination_html)
+        logger.info("Extracted pagination HTML (%d chars)", len(pagination_html))
+        logger.debug("Pagination HTML:\n%s", pagination_html)
 
-        static_examples = format_static_pagination_examples()
-
-        rag_pagination = self.vector_store.find_similar_pagination(pagination_html, k=3)
+        rag_pagination = []
+        if pagination_embedding is not None:
+            rag_pagination = self.vector_store.find_similar_by_embedding(pagination_embedding, k=3)
         logger.info(
             "Found %d similar pagination configs: %s",
             len(rag_pagination),
             [f"{c.source_name} (dist={c.distance:.3f})" for c in rag_pagination],
         )
-        dynamic_examples = format_dynamic_pagination_examples(rag_pagination)
-
-        pagination_examples_text = static_examples
-        if dynamic_examples:
-            pagination_examples_text += "\n" + dynamic_examples
+        # The static half is already baked into CONFIG_GENERATION_SYSTEM_TEXT
+        _, dynamic_examples = build_pagination_prompt(rag_pagination)
 
         # Step 4: Generate config using LLM
         logger.info("Step 4: Generating config with LLM")
         similar_configs_text = self._format_similar_configs(similar_configs)
-        cleaned_html = self.feature_extractor._prepare_html(html, truncate=False)
 
-        prompt = CONFIG_GENERATION_PROMPT.format(
+        system_prompt = CONFIG_GENERATION_SYSTEM_TEXT
+        prompt = CONFIG_GENERATION_PROMPT.substitute(
             url=url,
             source_name=source_name,
             html=cleaned_html,
-            features=features.to_text(),
+            features=features_text,
             similar_configs=similar_configs_text,
-            pagination_examples=pagination_examples_text,
+            dynamic_pagination_examples=dynamic_examples,
         )
 
-        llm_response = self.llm_client.call(prompt, step_label="config_generation")
+        llm_response = await self.llm_client.call(
+            prompt,
+            step_label="config_generation",
+            system_prompt=system_prompt,
+            validate=functools.partial(is_valid_model_response, GeneratedConfig),
+        )
 
-        llm_config = parse_json_response(llm_response)
+        # Step 5: Parse + validate config in one pass (pydantic-core JSON parser)
+        logger.info("Step 5: Validating config")
+        try:
+            config = GeneratedConfig.model_validate_json(extract_json_text(llm_response))
+        except ValidationError as e:
+            if not is_invalid_json_error(e):
+                raise
+            raise RuntimeError("LLM returned empty or invalid config") from e
 
-        if not llm_config:
+        if not config.model_fields_set:
             raise RuntimeError("LLM returned empty or invalid config")
 
-        # Step 5: Validate config
-        logger.info("Step 5: Validating config")
-        config = GeneratedConfig(**llm_config)
-
         logger.info("Config generation complete for: %s", source_name)
         self.last_debug = {
             "pagination_html": pagination_html,
-            "features": features.to_text(),
+            "features": features_text,
+            "system_prompt": system_prompt,
             "prompt": prompt,
         }
         return config
 
-    async def _fetch_html(self, url: str) -> str | None:
-        """Fetch HTML from URL using crawl4ai directly."""
-        browser_config = BrowserConfig(headless=True, text_mode=True, verbose=False)
-        crawler = AsyncWebCrawler(config=browser_config)
-
-        try:
-            await crawler.start()
+    async def _get_crawler(self) -> AsyncWebCrawler:
+        """Return the shared crawler, starting the browser on first use."""
+        async with self._crawler_lock:
+            if self._crawler is None:
+                browser_config = BrowserConfig(headless=True, text_mode=True, verbose=False)
+                crawler = AsyncWebCrawler(config=browser_config)
+                await crawler.start()
+                self._crawler = crawler
+            return self._crawler
+
+    async def _fetch_html(self, url: str, wait_for: str | None = None) -> str | None:
+        """Fetch HTML from URL using the shared crawl4ai crawler.
+
+        crawl4ai fails the whole fetch when ``wait_for`` never matches, so that
+        wait is bounded by ``WAIT_FOR_TIMEOUT`` and followed by a plain fetch.
+        """
+        crawler = await self._get_crawler()
+        if wait_for:
             result = await crawler.arun(
                 url=url,
                 config=CrawlerRunConfig(
-                    page_timeout=100000,
-                    delay_before_return_html=5,
-                    cache_mode=CacheMode.BYPASS,
+                    page_timeout=self.page_timeout,
+                    delay_before_return_html=min(self.delay_before_return_html, WAIT_FOR_SETTLE_DELAY),
+                    wait_until=self.wait_until,
+                    wait_for=f"css:{wait_for}",
+                    wait_for_timeout=WAIT_FOR_TIMEOUT,
+                    cache_mode=self.cache_mode,
                 ),
             )
-
             if result.success and result.html:
                 return result.html
+            logger.warning("wait_for %r did not match on %s, fetching without it", wait_for, url)
+
+        result = await crawler.arun(
+            url=url,
+            config=CrawlerRunConfig(
+                page_timeout=self.page_timeout,
+                delay_before_return_html=self.delay_before_return_html,
+                wait_until=self.wait_until,
+                cache_mode=self.cache_mode,
+            ),
+        )
+
+        if result.success and result.html:
+            return result.html
 
-            logger.error("Failed to fetch %s: %s", url, result.error_message)
-            return None
-        finally:
-            await crawler.close()
+        logger.error("Failed to fetch %s: %s", url, result.error_message)
+        return None
 
     def _format_similar_configs(self, similar_configs: list) -> str:
         """Format similar configs as text for the LLM prompt."""
@@ -155,19 +296,12 @@ class ConfigGenerator:
 
         parts = []
         for i, sc in enumerate(similar_configs, 1):
-            config = sc.full_config
             parts.append(f"--- Example {i}: {sc.source_name} (similarity distance: {sc.distance:.3f}) ---")
-            parts.append(f"URL: {config.get('data_source_url', 'N/A')}")
-            parts.append(f"data_render_type: {config.get('data_render_type', 'N/A')}")
-
-            # Show the key config fields
-            for field in ["json_css_schema", "crawlai_config", "pagination_config", "request_config"]:
-                value = config.get(field, {})
-                if isinstance(value, str):
-                    parts.append(f"{field}: {value}")
-                else:
-                    parts.append(f"{field}: {json.dumps(value, indent=2, ensure_ascii=False)}")
-
+            # Stored configs carry text pre-rendered at ingest (always compact)
+            if sc.formatted_text and self.compact_json:
+                parts.append(sc.formatted_text)
+            else:
+                parts.append(format_config_fields(sc.full_config, compact=self.compact_json))
             parts.append("")
 
         return "\n".join(parts)
@@ -1,7 +1,14 @@
+import hashlib
 import logging
+import sqlite3
+from collections.abc import Callable
 from datetime import datetime
 
+import httpx
 import openai
+import orjson
+
+from config_generator.utils import is_json_object_response
 
 logger = logging.getLogger(__name__)
 llm_debug_logger = logging.getLogger("config_generator.llm_debug")
@@ -13,66 +20,145 @@ OPENAI_PRICING = {
     "gpt-4o": {"input": 0.0025, "output": 0.01},
 }
 
+TEMPERATURE = 0.1
+
+REQUEST_LOG_TEMPLATE = (
+    "\n========== LLM REQUEST [%s] ==========\n"
+    "Timestamp: %s\n"
+    "Model: %s\n"
+    "Prompt length: %d chars (system: %d chars)\n\n"
+    "--- PROMPT ---\n%s\n"
+)
+RESPONSE_LOG_TEMPLATE = (
+    "\n========== LLM RESPONSE [%s] ==========\n"
+    "Timestamp: %s\n"
+    "Tokens: input=%d (cached=%d), output=%d, cost=$%.4f\n\n"
+    "--- RESPONSE ---\n%s\n"
+)
+
 
 class LLMClient:
-    """Thin wrapper around OpenAI chat completions with usage tracking and debug logging."""
+    """Thin wrapper around OpenAI chat completions with usage tracking and debug logging.
+
+    Responses are cached by an exact hash of model + prompt, but only once they
+    pass the caller's ``validate`` check, so a malformed reply is retried on the
+    next call. With ``cache_path`` the cache is a SQLite file shared across runs;
+    otherwise it lives in memory.
+    """
 
-    def __init__(self, api_key: str, model: str):
-        self.client = openai.OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, model: str, cache_path: str | None = None):
+        # HTTP/2 lets concurrent generations multiplex over one connection
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key,
+            http_client=openai.DefaultAsyncHttpxClient(http2=True),
+        )
         self.model = model
         self.total_input_tokens = 0
         self.total_output_tokens = 0
         self.total_cost = 0.0
-
-    def call(self, prompt: str, step_label: str = "llm_call") -> str:
-        """Call OpenAI API and return text response."""
-        llm_debug_logger.debug(
-            "\n========== LLM REQUEST [%s] ==========\n"
-            "Timestamp: %s\n"
-            "Model: %s\n"
-            "Prompt length: %d chars\n\n"
-            "--- PROMPT ---\n%s\n",
-            step_label,
-            datetime.now().isoformat(),
-            self.model,
-            len(prompt),
-            prompt,
+        self.cache_hits = 0
+        self._cache = sqlite3.connect(cache_path or ":memory:")
+        self._cache.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL)"
         )
+        self._cache.commit()
+
+    async def call(
+        self,
+        prompt: str,
+        step_label: str = "llm_call",
+        system_prompt: str | None = None,
+        validate: Callable[[str], bool] | None = None,
+    ) -> str:
+        """Call OpenAI API and return text response, serving repeats from the cache.
+
+        Args:
+            prompt: Dynamic user message.
+            step_label: Label used in logs.
+            system_prompt: Static instructions sent as the system message. Keeping
+                them identical across calls lets OpenAI reuse the cached prefix.
+            validate: Predicate a response must pass to be cached. Defaults to
+                requiring a parseable JSON object.
+        """
+        cache_key = self._cache_key(prompt, system_prompt)
+        cached = self._cache.execute(
+            "SELECT response FROM llm_cache WHERE key = ?", (cache_key,)
+        ).fetchone()
+        if cached is not None:
+            self.cache_hits += 1
+            logger.info("LLM cache hit [%s]", step_label)
+            return cached[0]
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
+        debug_enabled = llm_debug_logger.isEnabledFor(logging.DEBUG)
+        if debug_enabled:
+            llm_debug_logger.debug(
+                REQUEST_LOG_TEMPLATE,
+                step_label,
+                datetime.now().isoformat(),
+                self.model,
+                len(prompt),
+                len(system_prompt or ""),
+                prompt,
+            )
+
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+
+        # The request body (full page HTML) is serialized with orjson and the raw
+        # response parsed with orjson; the SDK still handles auth, retries and errors.
+        raw_response = await self.client.post(
+            "/chat/completions",
+            body=orjson.dumps({"model": self.model, "messages": messages, "temperature": TEMPERATURE}),
+            cast_to=httpx.Response,
         )
+        response = orjson.loads(raw_response.content)
 
         input_tokens = 0
         output_tokens = 0
+        cached_tokens = 0
         cost = 0.0
-        if response.usage:
-            input_tokens = response.usage.prompt_tokens
-            output_tokens = response.usage.completion_tokens
+        usage = response.get("usage")
+        if usage:
+            input_tokens = usage.get("prompt_tokens", 0)
+            output_tokens = usage.get("completion_tokens", 0)
+            cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
             self.total_input_tokens += input_tokens
             self.total_output_tokens += output_tokens
             cost = self._calculate_cost(input_tokens, output_tokens)
             self.total_cost += cost
 
-        response_text = response.choices[0].message.content
-
-        llm_debug_logger.debug(
-            "\n========== LLM RESPONSE [%s] ==========\n"
-            "Timestamp: %s\n"
-            "Tokens: input=%d, output=%d, cost=$%.4f\n\n"
-            "--- RESPONSE ---\n%s\n",
-            step_label,
-            datetime.now().isoformat(),
-            input_tokens,
-            output_tokens,
-            cost,
-            response_text,
-        )
+        response_text = response["choices"][0]["message"]["content"]
+
+        if debug_enabled:
+            llm_debug_logger.debug(
+                RESPONSE_LOG_TEMPLATE,
+                step_label,
+                datetime.now().isoformat(),
+                input_tokens,
+                cached_tokens,
+                output_tokens,
+                cost,
+                response_text,
+            )
+
+        if response_text is not None and (validate or is_json_object_response)(response_text):
+            self._cache.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                (cache_key, response_text, input_tokens, output_tokens),
+            )
+            self._cache.commit()
 
         return response_text
 
+    async def aclose(self):
+        """Close the HTTP client and the response cache."""
+        await self.client.close()
+        self._cache.close()
+
     def get_usage_summary(self) -> dict:
         """Return cumulative usage stats."""
         return {
@@ -80,8 +166,14 @@ class LLMClient:
             "output_tokens": self.total_output_tokens,
             "total_tokens": self.total_input_tokens + self.total_output_tokens,
             "total_cost_usd": round(self.total_cost, 4),
+            "cache_hits": self.cache_hits,
         }
 
+    def _cache_key(self, prompt: str, system_prompt: str | None = None) -> str:
+        """Return the exact-match cache key for a prompt pair under the current model."""
+        raw = f"{self.model}|{TEMPERATURE}|{system_prompt or ''}|{prompt}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
     def _calculate_cost(self, input_tokens: int, output_tokens: int) -> float:
         """Calculate cost in USD based on model pricing."""
         pricing = OPENAI_PRICING.get(self.model)
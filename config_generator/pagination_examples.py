@@ -3,11 +3,30 @@
 Each example pairs a realistic HTML pagination snippet with the working config.
 These are always included in the config generation prompt so the LLM can pattern-match
 instead of following fragile rules.
+
+Ordering matters for provider-side prompt caching: the static block must come
+first (it is part of the system message) and the RAG-retrieved dynamic block
+after it (in the user message). Use :func:`build_pagination_prompt` to get both
+parts in that order; the boundary between them is the cache breakpoint.
 """
 
-import json
+import io
+import sys
+from string import Template
+
+from config_generator.utils import dumps_json, ensure_dict_cached, truncate_html
+
+# UTF-8 budget for each retrieved pagination snippet in the dynamic prompt block
+DYNAMIC_PAGINATION_HTML_BYTES = 1000
 
-from config_generator.utils import ensure_dict
+# Layout of one example, shared by the static and dynamic blocks.
+# ``pagination_html_block`` is either empty or a full "Pagination HTML:" line.
+PAGINATION_EXAMPLE_TEMPLATE = Template(
+    "--- $title ---\n"
+    "${pagination_html_block}"
+    "data_render_type: $data_render_type\n"
+    "pagination_config: $pagination_config\n"
+)
 
 PAGINATION_EXAMPLES: list[dict] = [
     # ── SSR: query parameter (?page=N) ──────────────────────────────
@@ -184,22 +203,55 @@ PAGINATION_EXAMPLES: list[dict] = [
 ]
 
 
-def format_static_pagination_examples() -> str:
-    """Format all static examples as text for the LLM prompt."""
-    parts = ["=== STATIC PAGINATION REFERENCE EXAMPLES ==="]
-    parts.append(
+def _intern_strings(value):
+    """Return *value* with every str (dict keys included) passed through ``sys.intern``."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, dict):
+        return {sys.intern(k): _intern_strings(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_intern_strings(v) for v in value]
+    return value
+
+
+# Share one copy of repeated keys/selectors between the examples and any dicts
+# built from them (pages stay shared across forked workers).
+PAGINATION_EXAMPLES[:] = _intern_strings(PAGINATION_EXAMPLES)
+
+
+def _pagination_html_block(pagination_html: str) -> str:
+    """Render the optional "Pagination HTML" line of an example."""
+    return f"Pagination HTML:\n  {pagination_html}\n" if pagination_html else ""
+
+
+def _build_static_pagination_examples() -> str:
+    """Render PAGINATION_EXAMPLES as prompt text."""
+    header = (
+        "=== STATIC PAGINATION REFERENCE EXAMPLES ===\n"
         "These examples cover all known pagination patterns. "
-        "Study how the HTML maps to data_render_type and pagination_config.\n"
+        "Study how the HTML maps to data_render_type and pagination_config.\n\n"
     )
+    examples = "\n".join(
+        PAGINATION_EXAMPLE_TEMPLATE.substitute(
+            title=ex["label"],
+            pagination_html_block=_pagination_html_block(ex["pagination_html"]),
+            data_render_type=ex["data_render_type"],
+            pagination_config=dumps_json(ex["pagination_config"], sort_keys=True),
+        )
+        for ex in PAGINATION_EXAMPLES
+    )
+    return header + examples
+
+
+# The examples are constant, so render them once at import. Keys are sorted so the
+# block stays byte-identical across processes, keeping the static prompt prefix
+# cacheable on the provider side.
+_STATIC_PAGINATION_EXAMPLES_TEXT = _build_static_pagination_examples()
 
-    for ex in PAGINATION_EXAMPLES:
-        parts.append(f"--- {ex['label']} ---")
-        parts.append(f"Pagination HTML:\n  {ex['pagination_html']}")
-        parts.append(f"data_render_type: {ex['data_render_type']}")
-        parts.append(f"pagination_config: {json.dumps(ex['pagination_config'], indent=2)}")
-        parts.append("")
 
-    return "\n".join(parts)
+def format_static_pagination_examples() -> str:
+    """Format all static examples as text for the LLM prompt."""
+    return _STATIC_PAGINATION_EXAMPLES_TEXT
 
 
 def format_dynamic_pagination_examples(similar_configs: list) -> str:
@@ -211,22 +263,39 @@ def format_dynamic_pagination_examples(similar_configs: list) -> str:
     if not similar_configs:
         return ""
 
-    parts = ["\n=== DYNAMIC PAGINATION EXAMPLES (similar to target page) ==="]
-    parts.append(
-        "These are from production configs with pagination HTML similar to the target page.\n"
-    )
+    buf = io.StringIO()
+    write = buf.write
+    write("\n=== DYNAMIC PAGINATION EXAMPLES (similar to target page) ===\n")
+    write("These are from production configs with pagination HTML similar to the target page.\n\n")
 
     for i, sc in enumerate(similar_configs, 1):
         config = sc.full_config
-        pagination_config = ensure_dict(config.get("pagination_config", {}), default={})
+        pagination_config = ensure_dict_cached(config.get("pagination_config", {}), default={})
 
-        parts.append(f"--- Dynamic Example {i}: {sc.source_name} (distance: {sc.distance:.3f}) ---")
+        pagination_html = truncate_html(sc.pagination_html, DYNAMIC_PAGINATION_HTML_BYTES)
+        # Blank line between examples, none after the last
+        if i > 1:
+            write("\n")
+        write(
+            PAGINATION_EXAMPLE_TEMPLATE.substitute(
+                title=f"Dynamic Example {i}: {sc.source_name} (distance: {sc.distance:.3f})",
+                pagination_html_block=_pagination_html_block(pagination_html),
+                data_render_type=config.get("data_render_type", "N/A"),
+                pagination_config=dumps_json(pagination_config),
+            )
+        )
 
-        if sc.pagination_html:
-            parts.append(f"Pagination HTML:\n  {sc.pagination_html[:1000]}")
+    return buf.getvalue()
 
-        parts.append(f"data_render_type: {config.get('data_render_type', 'N/A')}")
-        parts.append(f"pagination_config: {json.dumps(pagination_config, indent=2)}")
-        parts.append("")
 
-    return "\n".join(parts)
+def build_pagination_prompt(similar_configs: list) -> tuple[str, str]:
+    """Return the pagination examples split at the prompt-cache breakpoint.
+
+    Args:
+        similar_configs: List of SimilarConfig objects with pagination_html field.
+
+    Returns:
+        ``(static_text, dynamic_text)``. ``static_text`` is byte-identical on
+        every call and belongs in the cached prefix; ``dynamic_text`` goes after it.
+    """
+    return format_static_pagination_examples(), format_dynamic_pagination_examples(similar_configs)
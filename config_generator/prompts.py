@@ -1,35 +1,32 @@
-TRAINING_FEATURE_PROMPT = """You are an expert web scraping analyst. You are given:
+from string import Template
+
+# Each prompt is split into a static system part and a dynamic user part so the
+# static instructions form an identical prefix across calls (OpenAI prompt caching).
+# Templates use ``$name`` placeholders, so literal JSON braces need no escaping.
+
+TRAINING_FEATURE_SYSTEM_PROMPT = """You are an expert web scraping analyst. You are given:
 1. Raw HTML from a website listing page
 2. A working scraping configuration for this page
 
 Analyze both and extract structured features that describe this page's scraping characteristics.
 
-HTML:
-{html}
-
-Working Configuration:
-- baseSelector: {base_selector}
-- pagination_type: {pagination_type}
-- data_render_type: {data_render_type}
-- Full config: {config_json}
-
 Extract the following features as JSON:
 
-{{
+{
     "page_structure": "description of how items are laid out (table, card grid, list, etc.)",
     "item_container_pattern": "CSS pattern used for item containers (e.g., div.item, tr, li.result)",
     "pagination_mechanism": "how pagination works: url_parameter, next_button_click, infinite_scroll, none",
     "data_render_type": "exactly one of: SSR, CSR — determined by the COMBINATION of content delivery + pagination method (see rules below)",
     "listing_type": "what type of listings: tenders, jobs, news, products, documents, etc.",
     "has_detail_links": true/false
-}}
+}
 
 RULES for determining data_render_type — data_render_type and pagination are INTERCONNECTED:
 
 SSR (Server-Side Rendered):
   - Content is visible in the raw HTML (items/data are in the DOM)
   - Pagination is URL-based: links have REAL href values like href="?page=2" or href="/tenders/page/3"
-  - Pagination config uses: next_page_link_template with {{}} placeholder, increment, first_page_number
+  - Pagination config uses: next_page_link_template with {} placeholder, increment, first_page_number
   - NEVER uses js_next_button or js_selector for pagination
   - Even if the page uses React/Angular with wait_for in crawlai_config, it's still SSR if pagination is URL-based
 
@@ -42,28 +39,29 @@ CSR (Client-Side Rendered):
 
 Return ONLY the JSON object, no explanations."""
 
-INFERENCE_FEATURE_PROMPT = """You are an expert web scraping analyst. You are given raw HTML from a website listing page.
-
-Analyze the HTML and extract structured features that describe this page's scraping characteristics.
-
-URL: {url}
+TRAINING_FEATURE_PROMPT = Template("""Working Configuration:
+- baseSelector: $base_selector
+- pagination_type: $pagination_type
+- data_render_type: $data_render_type
+- Full config: $config_json
 
 HTML:
-{html}
+$html""")
 
-Extracted pagination HTML snippet (focus on this to determine pagination_mechanism and data_render_type):
-{pagination_html}
+INFERENCE_FEATURE_SYSTEM_PROMPT = """You are an expert web scraping analyst. You are given raw HTML from a website listing page.
+
+Analyze the HTML and extract structured features that describe this page's scraping characteristics.
 
 Extract the following features as JSON:
 
-{{
+{
     "page_structure": "description of how items are laid out (table, card grid, list, etc.)",
     "item_container_pattern": "likely CSS selector pattern for item containers (e.g., div.item, tr, li.result)",
     "pagination_mechanism": "how pagination works: url_parameter, next_button_click, infinite_scroll, none",
     "data_render_type": "exactly one of: SSR, CSR — determined by the COMBINATION of content delivery + pagination method (see rules below)",
     "listing_type": "what type of listings: tenders, jobs, news, products, documents, etc.",
     "has_detail_links": true/false
-}}
+}
 
 RULES for determining data_render_type — data_render_type and pagination are INTERCONNECTED:
 
@@ -98,54 +96,64 @@ IMPORTANT: When in doubt between SSR and CSR, check the pagination links:
 
 Return ONLY the JSON object, no explanations."""
 
-CONFIG_GENERATION_PROMPT = """You are an expert web scraping configuration generator.
-
-Target URL: {url}
-Source Name: {source_name}
-
-Target HTML:
-{html}
+INFERENCE_FEATURE_PROMPT = Template("""URL: $url
 
-Pre-analyzed features of this page:
-{features}
+Extracted pagination HTML snippet (focus on this to determine pagination_mechanism and data_render_type):
+$pagination_html
 
-{pagination_examples}
+HTML:
+$html""")
 
-=== SIMILAR WEBSITE CONFIGS (from production) ===
-{similar_configs}
+CONFIG_GENERATION_SYSTEM_PROMPT = Template("""You are an expert web scraping configuration generator.
 
 Generate a complete scraping configuration JSON:
 
-{{
+{
     "data_render_type": "SSR or CSR",
-    "json_css_schema": {{
+    "json_css_schema": {
         "name": "Commit Extractor",
         "type": "list",
         "fields": [
-            {{"name": "html", "type": "html or children"}},
-            {{"name": "markdown", "type": "text"}}
+            {"name": "html", "type": "html or children"},
+            {"name": "markdown", "type": "text"}
         ],
         "baseSelector": "CSS selector for each item container"
-    }},
-    "crawlai_config": {{
+    },
+    "crawlai_config": {
         "text_mode": true,
         "page_timeout": 100000,
         "delay_before_return_html": 5
-    }},
-    "pagination_config": {{...}},
-    "request_config": {{...}}
-}}
+    },
+    "pagination_config": {...},
+    "request_config": {...}
+}
 
 Key rules:
-- fields MUST always be exactly: [{{"name": "html", "type": "html"}}, {{"name": "markdown", "type": "text"}}]. Do NOT generate custom fields like "title", "date", etc. We extract raw HTML and markdown per item, then parse them separately.
-- Match pagination_config structure to the most similar pagination example above
-- SSR: pagination links have real href URLs → use next_page_link_template with {{}} placeholder, increment, first_page_number. NEVER use js_next_button.
+- fields MUST always be exactly: [{"name": "html", "type": "html"}, {"name": "markdown", "type": "text"}]. Do NOT generate custom fields like "title", "date", etc. We extract raw HTML and markdown per item, then parse them separately.
+- Match pagination_config structure to the most similar pagination example (static reference below, dynamic ones in the request)
+- SSR: pagination links have real href URLs → use next_page_link_template with {} placeholder, increment, first_page_number. NEVER use js_next_button.
 - CSR: pagination uses href="#", onclick, data-link, or buttons → use js_next_button + js_selector. NEVER use next_page_link_template (except in hybrid scroll mode).
 - baseSelector must select individual item containers (each tender/item as a separate element)
 - For CSR, js_selector is the same concept as baseSelector (CSS for each item)
-- Default crawlai_config: {{"text_mode": true, "page_timeout": 100000, "delay_before_return_html": 5}}
+- Default crawlai_config: {"text_mode": true, "page_timeout": 100000, "delay_before_return_html": 5}
 - If JS rendering needed, add "wait_for" to crawlai_config
-- request_config: empty {{}}
+- request_config: empty {}
 - Cross-check: data_render_type must match pagination_config pattern (SSR↔URL-based, CSR↔JS click)
 
-Return ONLY the JSON configuration object."""
+Return ONLY the JSON configuration object.
+
+$static_pagination_examples""")
+
+CONFIG_GENERATION_PROMPT = Template("""$dynamic_pagination_examples
+
+=== SIMILAR WEBSITE CONFIGS (from production) ===
+$similar_configs
+
+Target URL: $url
+Source Name: $source_name
+
+Pre-analyzed features of this page:
+$features
+
+Target HTML:
+$html""")
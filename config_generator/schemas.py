@@ -1,4 +1,10 @@
-from pydantic import BaseModel, Field
+import json
+import logging
+
+import orjson
+from pydantic import BaseModel, Field, PrivateAttr, computed_field
+
+logger = logging.getLogger(__name__)
 
 
 class LLMFeatures(BaseModel):
@@ -59,14 +65,36 @@ class SimilarConfig(BaseModel):
         config_id: Unique identifier of the stored config.
         source_name: Human-readable name of the source.
         distance: Cosine distance from the query (lower = more similar).
-        full_config: Complete stored config dict.
+        full_config: Complete stored config dict. May instead be given as
+            ``full_config_json``, which is parsed on first access.
         features_text: Feature string used for embedding.
         pagination_html: Stored pagination HTML snippet.
+        formatted_text: Prompt text for the config, rendered once at ingest.
     """
 
     config_id: str = Field(description="ID of the config")
     source_name: str = Field(default="")
     distance: float = Field(default=0.0)
-    full_config: dict = Field(default_factory=dict)
+    full_config_json: str = Field(default="", repr=False)
     features_text: str = Field(default="")
     pagination_html: str = Field(default="")
+    formatted_text: str = Field(default="")
+
+    _full_config: dict | None = PrivateAttr(default=None)
+
+    def __init__(self, full_config: dict | None = None, **data):
+        super().__init__(**data)
+        self._full_config = full_config
+
+    @computed_field
+    @property
+    def full_config(self) -> dict:
+        """Stored config dict, parsed from ``full_config_json`` on first access."""
+        if self._full_config is None:
+            self._full_config = {}
+            if self.full_config_json:
+                try:
+                    self._full_config = orjson.loads(self.full_config_json)
+                except json.JSONDecodeError:
+                    logger.warning("Failed to parse full_config for %s", self.config_id)
+        return self._full_config
@@ -1,15 +1,37 @@
 """Shared helpers for the config_generator package."""
 
+import functools
 import json
 import logging
 import re
 
+import orjson
+from pydantic import BaseModel, ValidationError
+from selectolax.lexbor import LexborHTMLParser
+
 logger = logging.getLogger(__name__)
 
+COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+WHITESPACE_RE = re.compile(r"\s+")
+HTML_TAG_RE = re.compile(r"<html[\s>]", re.IGNORECASE)
+JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*\n?(.*?)\n?```", re.DOTALL)
+STRIPPED_TAGS = ("script", "style")
+STRIPPED_TAGS_WITH_NOSCRIPT = (*STRIPPED_TAGS, "noscript")
+# Regex equivalents of the stripped tags, used for fragments that a document parse would restructure
+STRIPPED_TAGS_RE = re.compile(r"<(script|style)\b[^>]*>.*?</\1\s*>", re.DOTALL | re.IGNORECASE)
+STRIPPED_TAGS_WITH_NOSCRIPT_RE = re.compile(
+    r"<(script|style|noscript)\b[^>]*>.*?</\1\s*>", re.DOTALL | re.IGNORECASE
+)
+
 
 def clean_html(html: str, remove_noscript: bool = False) -> str:
     """Remove script, style tags (and optionally noscript), HTML comments, and collapse whitespace.
 
+    Full documents are stripped on a lexbor parse tree (C tokenizer) and
+    re-serialized. Fragments (no ``<html>`` tag) go through precompiled regexes
+    instead, so their markup is kept as written: a document parse would drop
+    table-context tags such as a bare ``<tr>`` and add an ``<html>`` wrapper.
+
     Args:
         html: Raw HTML string.
         remove_noscript: If True, also strip ``<noscript>`` tags.
@@ -17,25 +39,38 @@ def clean_html(html: str, remove_noscript: bool = False) -> str:
     Returns:
         Cleaned HTML string.
     """
-    html = re.sub(r"<script[^>]*>.*?</script>", "", html, flags=re.DOTALL | re.IGNORECASE)
-    html = re.sub(r"<style[^>]*>.*?</style>", "", html, flags=re.DOTALL | re.IGNORECASE)
-    if remove_noscript:
-        html = re.sub(r"<noscript[^>]*>.*?</noscript>", "", html, flags=re.DOTALL | re.IGNORECASE)
-    html = re.sub(r"<!--.*?-->", "", html, flags=re.DOTALL)
-    html = re.sub(r"\s+", " ", html).strip()
-    return html
-
-
-def parse_json_response(text: str) -> dict:
-    """Extract JSON from LLM response, handling markdown code blocks.
+    if not html.strip():
+        return ""
+    if HTML_TAG_RE.search(html):
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(list(STRIPPED_TAGS_WITH_NOSCRIPT if remove_noscript else STRIPPED_TAGS))
+        html = tree.html or ""
+    else:
+        html = (STRIPPED_TAGS_WITH_NOSCRIPT_RE if remove_noscript else STRIPPED_TAGS_RE).sub("", html)
+    # Substring check is a C-level scan; skip the regex pass when there are no comments
+    if "<!--" in html:
+        html = COMMENT_RE.sub("", html)
+    return WHITESPACE_RE.sub(" ", html).strip()
+
+
+def extract_json_text(text: str) -> str:
+    """Return the JSON object region of an LLM response, without parsing it.
+
+    Handles markdown code blocks and surrounding prose. The result can be fed
+    straight to ``Model.model_validate_json`` so parsing happens in pydantic-core.
 
     Args:
         text: Raw LLM response text.
 
     Returns:
-        Parsed dict, or empty dict on failure.
+        The (unvalidated) JSON text.
     """
-    json_match = re.search(r"```(?:json)?\s*\n?(.*?)\n?```", text, re.DOTALL)
+    # Fast path: a bare JSON object (the usual case) needs no fence search
+    stripped = text.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        return stripped
+
+    json_match = JSON_BLOCK_RE.search(text)
     if json_match:
         text = json_match.group(1)
 
@@ -45,15 +80,131 @@ def parse_json_response(text: str) -> dict:
         end = text.rfind("}")
         if start != -1 and end != -1:
             text = text[start : end + 1]
+    return text
+
 
+def is_invalid_json_error(error: ValidationError) -> bool:
+    """Return True if a ``model_validate_json`` failure was caused by malformed JSON."""
+    return any(err["type"] == "json_invalid" for err in error.errors())
+
+
+def is_json_object_response(text: str) -> bool:
+    """Return True if an LLM response contains a parseable JSON object."""
     try:
-        return json.loads(text)
+        return isinstance(orjson.loads(extract_json_text(text)), dict)
+    except orjson.JSONDecodeError:
+        return False
+
+
+def is_valid_model_response(model: type[BaseModel], text: str) -> bool:
+    """Return True if an LLM response validates as *model* with at least one field set.
+
+    Args:
+        model: Pydantic model the response should contain.
+        text: Raw LLM response text.
+
+    Returns:
+        Whether the response is usable (and so worth caching).
+    """
+    try:
+        return bool(model.model_validate_json(extract_json_text(text)).model_fields_set)
+    except ValidationError:
+        return False
+
+
+def parse_json_response(text: str) -> dict:
+    """Extract JSON from LLM response, handling markdown code blocks.
+
+    Args:
+        text: Raw LLM response text.
+
+    Returns:
+        Parsed dict, or empty dict on failure.
+    """
+    text = extract_json_text(text)
+    try:
+        return orjson.loads(text)
     except json.JSONDecodeError as e:
         logger.error("Failed to parse JSON from LLM response: %s", e)
         logger.debug("Raw response: %s", text[:500])
         return {}
 
 
+CONFIG_PROMPT_FIELDS = ("json_css_schema", "crawlai_config", "pagination_config", "request_config")
+
+
+def dumps_json(value, compact: bool = False, sort_keys: bool = False) -> str:
+    """Serialize *value* as non-ASCII-preserving JSON using orjson.
+
+    Args:
+        value: JSON-serializable object.
+        compact: If True, emit single-line JSON instead of 2-space indentation.
+        sort_keys: If True, sort object keys so the output is byte-stable.
+
+    Returns:
+        JSON string.
+    """
+    option = orjson.OPT_NON_STR_KEYS
+    if not compact:
+        option |= orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(value, option=option).decode()
+
+
+def format_config_fields(config: dict, compact: bool = True) -> str:
+    """Render the prompt-relevant fields of a stored config as text.
+
+    Args:
+        config: Full config dict.
+        compact: Serialize nested fields as single-line JSON (fewer prompt tokens).
+
+    Returns:
+        Multi-line text with URL, data_render_type and the key config fields.
+    """
+    parts = [
+        f"URL: {config.get('data_source_url', 'N/A')}",
+        f"data_render_type: {config.get('data_render_type', 'N/A')}",
+    ]
+    for field in CONFIG_PROMPT_FIELDS:
+        value = config.get(field, {})
+        if isinstance(value, str):
+            parts.append(f"{field}: {value}")
+        else:
+            parts.append(f"{field}: {dumps_json(value, compact=compact)}")
+    return "\n".join(parts)
+
+
+def truncate_html(html: str, max_bytes: int) -> str:
+    """Truncate an HTML snippet to at most *max_bytes* of UTF-8.
+
+    The cut never splits a multi-byte character, and a trailing partial tag is
+    dropped so the prefix ends on a tag boundary or inside text.
+
+    Args:
+        html: HTML snippet.
+        max_bytes: Maximum UTF-8 size of the result.
+
+    Returns:
+        The (possibly shortened) snippet.
+    """
+    if len(html) * 4 <= max_bytes:
+        return html
+    encoded = html.encode()
+    if len(encoded) <= max_bytes:
+        return html
+    truncated = encoded[:max_bytes].decode(errors="ignore")
+    tag_start = truncated.rfind("<")
+    if tag_start > truncated.rfind(">"):
+        truncated = truncated[:tag_start]
+    return truncated
+
+
+# Parsed config fields recur across retrieved examples; results are shared, treat as read-only
+JSON_PARSE_CACHE_SIZE = 256
+_parse_json_cached = functools.lru_cache(maxsize=JSON_PARSE_CACHE_SIZE)(orjson.loads)
+
+
 def ensure_dict(value, default=None):
     """Coerce *value* to a dict, parsing JSON strings if needed.
 
@@ -68,7 +219,27 @@ def ensure_dict(value, default=None):
         return value
     if isinstance(value, str):
         try:
-            return json.loads(value)
+            return orjson.loads(value)
         except (json.JSONDecodeError, TypeError):
             return default if default is not None else {}
     return value if value is not None else (default if default is not None else {})
+
+
+def ensure_dict_cached(value, default=None):
+    """Like :func:`ensure_dict`, but memoizes JSON string parses.
+
+    The returned dict may be shared with other callers and must not be mutated.
+
+    Args:
+        value: A dict, a JSON string, or something else.
+        default: Value returned when *value* cannot be converted.
+
+    Returns:
+        A dict (or *default*).
+    """
+    if isinstance(value, str):
+        try:
+            return _parse_json_cached(value)
+        except (json.JSONDecodeError, TypeError):
+            return default if default is not None else {}
+    return ensure_dict(value, default=default)
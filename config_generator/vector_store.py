@@ -1,27 +1,157 @@
-import json
+import asyncio
+import functools
 import logging
+from collections import OrderedDict
 
-import chromadb
-from sentence_transformers import SentenceTransformer
+import numpy as np
 
 from config_generator.schemas import LLMFeatures, SimilarConfig
+from config_generator.utils import dumps_json, format_config_fields, truncate_html
 
 logger = logging.getLogger(__name__)
 
 COLLECTION_NAME = "website_configs"
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Embeddings are L2-normalized at encode time, so inner product ranks like cosine.
+# Search runs on the in-memory index, so this only affects Chroma's own HNSW build,
+# and only for newly created collections.
+HNSW_SPACE = "ip"
+# Exact-text LRU of embedder outputs; repeated features/pagination snippets skip the model
+EMBEDDING_CACHE_SIZE = 512
+# Below this many configs an exact matrix-vector product is cheaper
+# than the binary pre-filter
+EXACT_SEARCH_LIMIT = 10_000
+# Candidates kept by the binary (Hamming) pre-filter / considered by MMR
+RERANK_CANDIDATES = 50
+# UTF-8 budget for the pagination snippet kept in Chroma metadata
+MAX_PAGINATION_HTML_BYTES = 2000
+# Encoded batches buffered between the embedder and Chroma in add_configs_async
+INGEST_QUEUE_SIZE = 2
+# The in-memory float index is stored at half precision (normalized MiniLM vectors
+# lose <1e-3 cosine); scoring upcasts to float32 in blocks to keep BLAS and bound memory
+INDEX_DTYPE = np.float16
+SCORE_BLOCK_ROWS = 4096
+
+# Number of set bits for every byte value, used to popcount XOR-ed binary codes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_embedder(model_name: str):
+    """Load a SentenceTransformer once per model name and share it between stores."""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize embeddings row-wise (float32)."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def _binarize(embeddings: np.ndarray) -> np.ndarray:
+    """Quantize embeddings to 1 bit per dimension (sign), packed into uint8."""
+    return np.packbits(embeddings > 0, axis=-1)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    if k < len(scores):
+        top = np.argpartition(-scores, k)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top])]
+
+
+def _dedupe_items(items: list[tuple]) -> list[tuple]:
+    """Drop all but the last item per config ID (first-seen order)."""
+    return list({item[0]: item for item in items}.values())
+
+
+def _mmr(
+    candidate_embeddings: np.ndarray,
+    similarities: np.ndarray,
+    k: int,
+    diversity: float,
+) -> np.ndarray:
+    """Maximal Marginal Relevance selection over pre-ranked candidates.
+
+    Args:
+        candidate_embeddings: Normalized candidate embeddings, shape ``(n, d)``.
+        similarities: Cosine similarity of each candidate to the query.
+        k: Number of candidates to select.
+        diversity: Weight of the redundancy penalty (0 = pure relevance).
+
+    Returns:
+        Indices into the candidates, in selection order.
+    """
+    pairwise = candidate_embeddings @ candidate_embeddings.T
+    selected = [int(np.argmax(similarities))]
+    max_redundancy = pairwise[selected[0]].copy()
+    available = np.ones(len(similarities), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < min(k, len(similarities)):
+        scores = (1.0 - diversity) * similarities - diversity * max_redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_redundancy, pairwise[best], out=max_redundancy)
+    return np.array(selected)
 
 
 class ConfigVectorStore:
-    """ChromaDB wrapper for storing and retrieving website configs by feature similarity."""
+    """ChromaDB wrapper for storing and retrieving website configs by feature similarity.
+
+    ChromaDB stays the store of record. Similarity search runs on an in-memory
+    copy of the embeddings: a binary-quantized Hamming pre-filter selects
+    candidates, which are then re-ranked by cosine similarity against a
+    float16 copy of the normalized embeddings.
+
+    chromadb and sentence-transformers (torch) are imported, and the client,
+    embedder and in-memory index created, only on first use.
+
+    The in-memory index assumes this instance is the only writer to
+    ``persist_dir``: configs written by another process or another store on the
+    same directory are not seen until :meth:`refresh`. IDs deleted elsewhere are
+    dropped from results and trigger a reload on the next query.
+    """
 
     def __init__(self, persist_dir: str):
-        self.client = chromadb.PersistentClient(path=persist_dir)
-        self.embedder = SentenceTransformer(EMBEDDING_MODEL)
-        self.collection = self.client.get_or_create_collection(
-            name=COLLECTION_NAME,
-            metadata={"hnsw:space": "cosine"},
-        )
+        self.persist_dir = persist_dir
+        self._client = None
+        self._collection = None
+        self._embedder = None
+        self._index_loaded = False
+        self._embedding_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+
+    @property
+    def client(self):
+        """ChromaDB persistent client, created on first access."""
+        if self._client is None:
+            import chromadb
+
+            self._client = chromadb.PersistentClient(path=self.persist_dir)
+        return self._client
+
+    @property
+    def collection(self):
+        """The configs collection, opened (or created) on first access."""
+        if self._collection is None:
+            self._collection = self.client.get_or_create_collection(
+                name=COLLECTION_NAME,
+                metadata={"hnsw:space": HNSW_SPACE},
+            )
+        return self._collection
+
+    @property
+    def embedder(self):
+        """SentenceTransformer model, loaded on first access and shared process-wide."""
+        if self._embedder is None:
+            self._embedder = _get_embedder(EMBEDDING_MODEL)
+        return self._embedder
 
     def add_config(
         self,
@@ -38,48 +168,125 @@ class ConfigVectorStore:
             config_metadata: Full config dict to store as metadata for retrieval.
             pagination_html: Extracted pagination HTML snippet for similarity search.
         """
-        features_text = llm_features.to_text()
-        embedding = self.embedder.encode(features_text).tolist()
-
-        # ChromaDB metadata values must be str, int, float, or bool
-        metadata = {
-            "source_name": config_metadata.get("source_name", ""),
-            "features_text": features_text,
-            "full_config": json.dumps(config_metadata, ensure_ascii=False),
-            "pagination_html": pagination_html[:2000] if pagination_html else "",
-        }
+        self.add_configs_bulk([(config_id, llm_features, config_metadata, pagination_html)])
 
+    def add_configs_bulk(self, items: list[tuple[str, LLMFeatures, dict, str]]):
+        """Add many configs with one batched encode and one Chroma upsert.
+
+        Args:
+            items: ``(config_id, llm_features, config_metadata, pagination_html)``
+                tuples, as for :meth:`add_config`. Later duplicates of an ID win.
+        """
+        config_ids, documents, metadatas = self._prepare_batch(_dedupe_items(items))
+        if not config_ids:
+            return
+
+        # Ingest bypasses the LRU so it doesn't evict recent query embeddings
+        embeddings = self.embedder.encode(documents, normalize_embeddings=True)
         self.collection.upsert(
-            ids=[config_id],
-            embeddings=[embedding],
-            metadatas=[metadata],
-            documents=[features_text],
+            ids=config_ids,
+            embeddings=embeddings.tolist(),
+            metadatas=metadatas,
+            documents=documents,
         )
-        logger.info("Added config %s (%s) to vector store", config_id, metadata["source_name"])
+        self._index_upsert(config_ids, embeddings)
+        if len(config_ids) == 1:
+            logger.info("Added config %s (%s) to vector store", config_ids[0], metadatas[0]["source_name"])
+        else:
+            logger.info("Added %d configs to vector store", len(config_ids))
+
+    async def add_configs_async(
+        self,
+        items: list[tuple[str, LLMFeatures, dict, str]],
+        batch_size: int = 32,
+    ):
+        """Bulk-add configs, overlapping embedding of one batch with the upsert of the previous.
+
+        Encoding and Chroma writes run in worker threads, connected by a bounded
+        queue, so the event loop stays free during a large re-index. The
+        embedding LRU is bypassed and the in-memory index is only touched from
+        the loop, so concurrent :meth:`find_similar` calls stay safe.
+
+        Args:
+            items: Tuples as for :meth:`add_configs_bulk`. Later duplicates of an ID win.
+            batch_size: Number of configs encoded and upserted together.
+        """
+        items = _dedupe_items(items)
+        if not items:
+            return
+        await asyncio.to_thread(self._ensure_index)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+
+        def encode_batch(batch):
+            config_ids, documents, metadatas = self._prepare_batch(batch)
+            embeddings = self.embedder.encode(documents, normalize_embeddings=True)
+            return config_ids, embeddings, metadatas, documents
+
+        async def produce():
+            for start in range(0, len(items), batch_size):
+                await queue.put(await asyncio.to_thread(encode_batch, items[start : start + batch_size]))
+            await queue.put(None)
+
+        async def consume():
+            while (batch := await queue.get()) is not None:
+                config_ids, embeddings, metadatas, documents = batch
+                await asyncio.to_thread(
+                    self.collection.upsert,
+                    ids=config_ids,
+                    embeddings=embeddings.tolist(),
+                    metadatas=metadatas,
+                    documents=documents,
+                )
+                self._index_upsert(config_ids, embeddings)
 
-    def find_similar(self, llm_features: LLMFeatures, k: int = 3) -> list[SimilarConfig]:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(produce())
+            group.create_task(consume())
+        logger.info("Added %d configs to vector store", len(items))
+
+    def _prepare_batch(
+        self, items: list[tuple[str, LLMFeatures, dict, str]]
+    ) -> tuple[list[str], list[str], list[dict]]:
+        """Build the IDs, embedded documents and Chroma metadata for *items*."""
+        config_ids = []
+        documents = []
+        metadatas = []
+        for config_id, llm_features, config_metadata, pagination_html in items:
+            features_text = llm_features.to_text()
+            config_ids.append(config_id)
+            documents.append(features_text)
+            # ChromaDB metadata values must be str, int, float, or bool
+            metadatas.append(
+                {
+                    "source_name": config_metadata.get("source_name", ""),
+                    "features_text": features_text,
+                    "full_config": dumps_json(config_metadata, compact=True),
+                    "pagination_html": truncate_html(pagination_html or "", MAX_PAGINATION_HTML_BYTES),
+                    "formatted_text": format_config_fields(config_metadata),
+                }
+            )
+        return config_ids, documents, metadatas
+
+    def find_similar(
+        self,
+        llm_features: LLMFeatures,
+        k: int = 3,
+        diversity: float = 0.0,
+    ) -> list[SimilarConfig]:
         """Find the k most similar configs to the given features.
 
         Args:
             llm_features: Features to search for.
             k: Number of similar configs to return.
+            diversity: If > 0, re-rank with Maximal Marginal Relevance so the
+                examples are less redundant with each other.
 
         Returns:
             List of SimilarConfig results ordered by similarity.
         """
         features_text = llm_features.to_text()
-        embedding = self.embedder.encode(features_text).tolist()
-
-        count = self.get_count()
-        if count == 0:
-            return []
-
-        results = self.collection.query(
-            query_embeddings=[embedding],
-            n_results=min(k, count),
-        )
-
-        return self._parse_query_results(results)
+        embedding = self._encode([features_text])[0]
+        return self._query(embedding, k, diversity=diversity)
 
     def find_similar_pagination(self, pagination_html: str, k: int = 3) -> list[SimilarConfig]:
         """Find configs with similar pagination HTML.
@@ -94,60 +301,203 @@ class ConfigVectorStore:
         if not pagination_html:
             return []
 
-        embedding = self.embedder.encode(pagination_html).tolist()
-        count = self.get_count()
-        if count == 0:
+        embedding = self._encode([pagination_html])[0]
+        return self._query(embedding, k)
+
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
+        """Encode several query texts in a single embedder forward pass.
+
+        Args:
+            texts: Texts to embed (e.g. feature text and pagination HTML).
+
+        Returns:
+            L2-normalized array of shape ``(len(texts), dim)``.
+        """
+        return self._encode(texts)
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        """Encode *texts*, reusing cached embeddings and batching the misses."""
+        cache = self._embedding_cache
+        found = {}
+        for text in texts:
+            if text in cache:
+                cache.move_to_end(text)
+                found[text] = cache[text]
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            for text, embedding in zip(missing, self.embedder.encode(missing, normalize_embeddings=True)):
+                # Copy the row so the cache doesn't keep the whole batch array alive
+                embedding = embedding.copy()
+                embedding.setflags(write=False)
+                found[text] = cache[text] = embedding
+            while len(cache) > EMBEDDING_CACHE_SIZE:
+                cache.popitem(last=False)
+        return np.stack([found[text] for text in texts])
+
+    def find_similar_by_embedding(
+        self,
+        embedding: np.ndarray,
+        k: int = 3,
+        diversity: float = 0.0,
+    ) -> list[SimilarConfig]:
+        """Find the k most similar configs to a precomputed query embedding.
+
+        Args:
+            embedding: L2-normalized query embedding, e.g. a row of :meth:`embed_batch`.
+            k: Number of similar configs to return.
+            diversity: If > 0, re-rank with Maximal Marginal Relevance.
+
+        Returns:
+            List of SimilarConfig results ordered by similarity.
+        """
+        return self._query(embedding, k, diversity=diversity)
+
+    def _load_index(self):
+        """Build the in-memory float16 and binary indexes from the Chroma collection."""
+        stored = self.collection.get(include=["embeddings"])
+        self._ids: list[str] = list(stored["ids"]) if stored else []
+        if self._ids:
+            vectors = _normalize(stored["embeddings"])
+        else:
+            vectors = np.empty((0, 0), dtype=np.float32)
+        self._codes = _binarize(vectors)
+        self._embeddings = vectors.astype(INDEX_DTYPE)
+        self._positions = {config_id: i for i, config_id in enumerate(self._ids)}
+        self._index_loaded = True
+
+    def _ensure_index(self):
+        """Load the in-memory indexes on first use."""
+        if not self._index_loaded:
+            self._load_index()
+
+    def refresh(self):
+        """Reload the in-memory index from ChromaDB (picks up writes by other processes)."""
+        self._load_index()
+
+    def _index_upsert(self, config_ids: list[str], embeddings: np.ndarray):
+        """Insert or replace embeddings in the in-memory indexes (IDs must be unique)."""
+        self._ensure_index()
+        # Already normalized by the embedder; only _load_index normalizes (older stored vectors)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        codes = _binarize(vectors)
+        new_rows = []
+        for row, config_id in enumerate(config_ids):
+            position = self._positions.get(config_id)
+            if position is None:
+                new_rows.append(row)
+                continue
+            self._embeddings[position] = vectors[row]
+            self._codes[position] = codes[row]
+        if not new_rows:
+            return
+
+        if self._ids:
+            self._embeddings = np.vstack([self._embeddings, vectors[new_rows].astype(INDEX_DTYPE)])
+            self._codes = np.vstack([self._codes, codes[new_rows]])
+        else:
+            self._embeddings = vectors[new_rows].astype(INDEX_DTYPE)
+            self._codes = codes[new_rows]
+        for row in new_rows:
+            self._positions[config_ids[row]] = len(self._ids)
+            self._ids.append(config_ids[row])
+
+    def _query(self, embedding, k: int, diversity: float = 0.0) -> list[SimilarConfig]:
+        """Return the k nearest stored configs to *embedding* (cosine distance)."""
+        self._ensure_index()
+        if not self._ids:
             return []
 
-        results = self.collection.query(
-            query_embeddings=[embedding],
-            n_results=min(k, count),
-        )
+        query = np.asarray(embedding, dtype=np.float32)
+        num_candidates = max(k, RERANK_CANDIDATES)
+        if len(self._ids) <= EXACT_SEARCH_LIMIT:
+            all_similarities = np.concatenate(
+                [
+                    self._embeddings[start : start + SCORE_BLOCK_ROWS].astype(np.float32) @ query
+                    for start in range(0, len(self._ids), SCORE_BLOCK_ROWS)
+                ]
+            )
+            candidates = _top_k(all_similarities, num_candidates)
+        else:
+            hamming = _POPCOUNT[np.bitwise_xor(self._codes, _binarize(query))].sum(axis=1, dtype=np.int32)
+            candidates = np.argpartition(hamming, num_candidates)[:num_candidates]
+
+        candidate_embeddings = self._embeddings[candidates].astype(np.float32)
+        similarities = candidate_embeddings @ query
+        if diversity > 0:
+            order = _mmr(candidate_embeddings, similarities, k, diversity)
+        else:
+            order = _top_k(similarities, k)
+        top_ids = [self._ids[i] for i in candidates[order]]
+        distances = (1.0 - similarities[order]).tolist()
 
+        stored = self.collection.get(ids=top_ids, include=["metadatas"])
+        metadata_by_id = dict(zip(stored["ids"], stored["metadatas"]))
+        if len(metadata_by_id) < len(top_ids):
+            # Deleted outside this instance: skip them and rebuild the index on the next query
+            missing = len(top_ids) - len(metadata_by_id)
+            logger.warning("Index is stale (%d IDs missing from ChromaDB)", missing)
+            self._index_loaded = False
+            kept = [i for i, config_id in enumerate(top_ids) if config_id in metadata_by_id]
+            top_ids = [top_ids[i] for i in kept]
+            distances = [distances[i] for i in kept]
+        results = {
+            "ids": [top_ids],
+            "metadatas": [[metadata_by_id[config_id] or {} for config_id in top_ids]],
+            "distances": [distances],
+        }
         return self._parse_query_results(results)
 
     def _parse_query_results(self, results) -> list[SimilarConfig]:
         """Convert raw ChromaDB query results into a list of SimilarConfig."""
         similar_configs = []
-        if results and results["ids"] and results["ids"][0]:
-            for i, config_id in enumerate(results["ids"][0]):
-                metadata = results["metadatas"][0][i] if results["metadatas"] else {}
-                distance = results["distances"][0][i] if results["distances"] else 0.0
-
-                full_config = {}
-                if metadata.get("full_config"):
-                    try:
-                        full_config = json.loads(metadata["full_config"])
-                    except json.JSONDecodeError:
-                        logger.warning("Failed to parse full_config for %s", config_id)
-
-                similar_configs.append(
-                    SimilarConfig(
-                        config_id=config_id,
-                        source_name=metadata.get("source_name", ""),
-                        distance=distance,
-                        full_config=full_config,
-                        features_text=metadata.get("features_text", ""),
-                        pagination_html=metadata.get("pagination_html", ""),
-                    )
+        if not (results and results["ids"] and results["ids"][0]):
+            return similar_configs
+
+        ids = results["ids"][0]
+        metadatas = results["metadatas"][0] if results.get("metadatas") else [{}] * len(ids)
+        distances = results["distances"][0] if results.get("distances") else [0.0] * len(ids)
+        append = similar_configs.append
+        for config_id, metadata, distance in zip(ids, metadatas, distances):
+            # full_config is parsed lazily by SimilarConfig on first access
+            append(
+                SimilarConfig(
+                    config_id=config_id,
+                    source_name=metadata.get("source_name", ""),
+                    distance=distance,
+                    full_config_json=metadata.get("full_config", ""),
+                    features_text=metadata.get("features_text", ""),
+                    pagination_html=metadata.get("pagination_html", ""),
+                    formatted_text=metadata.get("formatted_text", ""),
                 )
+            )
 
         return similar_configs
 
     def get_count(self) -> int:
-        """Return the number of configs in the store."""
+        """Return the number of configs in the store.
+
+        Served from the in-memory index once it is loaded (kept in step by
+        ``add_config*`` and ``reset``); before that, from ``collection.count()``
+        so counting never pulls the embeddings.
+        """
+        if self._index_loaded:
+            return len(self._ids)
         return self.collection.count()
 
     def has_config(self, config_id: str) -> bool:
-        """Check if a config with the given ID exists."""
-        result = self.collection.get(ids=[config_id])
+        """Check if a config with the given ID exists.
+
+        Answered from the in-memory index once it is loaded; otherwise asks
+        ChromaDB for the ID only (no metadata, documents or embeddings).
+        """
+        if self._index_loaded:
+            return config_id in self._positions
+        result = self.collection.get(ids=[config_id], include=[])
         return bool(result and result["ids"])
 
     def reset(self):
         """Delete the collection and recreate it."""
         self.client.delete_collection(COLLECTION_NAME)
-        self.collection = self.client.get_or_create_collection(
-            name=COLLECTION_NAME,
-            metadata={"hnsw:space": "cosine"},
-        )
+        self._collection = None
+        self._load_index()
         logger.info("Vector store reset")